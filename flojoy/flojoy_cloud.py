@@ -1,10 +1,28 @@
 from PIL import Image as PILImage
+import asyncio
+import base64
+from collections import OrderedDict
+import functools
+import io
 import json
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import numpy as np
-from pydantic import validator, BaseModel
-from typing import Optional, Generic, TypeVar
+from pydantic import (
+    AfterValidator,
+    Field,
+    Strict,
+    StrictFloat,
+    StrictInt,
+    TypeAdapter,
+    model_validator,
+)
+from pydantic.dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Any, Iterable, Literal, Optional, Union
 
 from flojoy import DataContainer
 from flojoy.data_container import (
@@ -17,7 +35,7 @@ from flojoy.data_container import (
     Scalar,
     Image,
 )
-from flojoy.utils import PlotlyJSONEncoder
+from flojoy.utils import PlotlyJSONEncoder, get_credentials
 
 
 class NumpyEncoder(json.JSONEncoder):
@@ -33,342 +51,419 @@ class NumpyEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
-DataC = TypeVar("DataC")
+_plotly_default = PlotlyJSONEncoder().default
+
+
+def _json_default(obj):
+    """
+    orjson serializes numpy arrays natively; anything it cannot handle
+    (non-contiguous arrays, timestamps, figures, ...) falls back to plotly's
+    rules, except DataFrames which are sent as objects rather than to_json()
+    strings.
+    """
+    if isinstance(obj, pd.DataFrame):
+        # "split" lists the index and columns once instead of per cell
+        return obj.to_dict(orient="split")
+    return _plotly_default(obj)
+
+
+def _dumps(obj) -> str:
+    """Serialize a payload with orjson."""
+    return orjson.dumps(
+        obj,
+        default=_json_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+    ).decode()
+
+
+# Validators raise instead of assert so they still run under python -O.
+_NOT_NUMERIC = "dataset is not a numeric array"
+_NOT_1D = "dataset is not 1D"
+_NOT_2D = "dataset is not 2D"
+_MISSING_PNG_DATA = 'dataContainer does not contain "data".'
+_MISSING_CHANNELS = 'dataContainer does not contain "r", "g" and "b" datasets.'
+
+# strict, so lists are not coerced from tuples and numbers not from strings
+_List = Annotated[list, Strict()]
+_Number = Union[StrictFloat, StrictInt]
+
+
+def _check_array(values: list, ndim: int, message: str) -> list:
+    # numpy scans the (possibly nested) list in C, rejecting ragged or
+    # non-numeric datasets without a per-element Python loop
+    try:
+        arr = np.asarray(values)
+    except ValueError:
+        raise ValueError(_NOT_NUMERIC) from None
+    if arr.ndim != ndim:
+        raise ValueError(message)
+    if arr.dtype.kind == "O":
+        # nulls (NaN, see _dumps) leave numpy with an object array, only the
+        # remaining values have to be numbers
+        arr = np.asarray(arr[arr != None].tolist())  # noqa: E711
+        if arr.size == 0:
+            return values
+    if arr.dtype.kind not in "fiu":
+        raise ValueError(_NOT_NUMERIC)
+    return values
+
+
+_Array1D = Annotated[_List, AfterValidator(lambda v: _check_array(v, 1, _NOT_1D))]
+_Array2D = Annotated[_List, AfterValidator(lambda v: _check_array(v, 2, _NOT_2D))]
+
+
+# Models are slotted frozen dataclasses: validation never needs more than
+# their fields, so instances carry no per-instance __dict__.
+@dataclass(slots=True, frozen=True)
+class OrderedPairModel:
+    type: Literal["OrderedPair"]
+    x: _Array1D
+    y: _Array1D
+
+
+@dataclass(slots=True, frozen=True)
+class OrderedTripleModel:
+    type: Literal["OrderedTriple"]
+    x: _Array1D
+    y: _Array1D
+    z: _Array1D
+
+
+@dataclass(slots=True, frozen=True)
+class DataFrameModel:
+    type: Literal["DataFrame"]
+    m: Annotated[dict, Strict()]
+
+
+@dataclass(slots=True, frozen=True)
+class MatrixModel:
+    type: Literal["Matrix"]
+    m: _Array2D
+
+
+@dataclass(slots=True, frozen=True)
+class GrayscaleModel:
+    type: Literal["Grayscale"]
+    m: _Array2D
+
+
+@dataclass(slots=True, frozen=True)
+class ScalarModel:
+    type: Literal["Scalar"]
+    # orjson writes NaN as null
+    c: Optional[_Number]
+
+
+@dataclass(slots=True, frozen=True)
+class VectorModel:
+    type: Literal["Vector"]
+    v: _Array1D
+
+
+@dataclass(slots=True, frozen=True)
+class ImageModel:
+    type: Literal["Image"]
+    r: Optional[_Array2D] = None
+    g: Optional[_Array2D] = None
+    b: Optional[_Array2D] = None
+    a: Optional[_Array2D] = None
+    format: Optional[Literal["png_b64"]] = None
+    data: Optional[str] = None
+
+    @model_validator(mode="after")
+    def channels_or_png(self):
+        if self.format == "png_b64":
+            if self.data is None:
+                raise ValueError(_MISSING_PNG_DATA)
+        elif self.r is None or self.g is None or self.b is None:
+            raise ValueError(_MISSING_CHANNELS)
+        return self
+
+
+# connections kept per host, also the default number of concurrent uploads
+_POOL_SIZE = 10
+# idempotent requests are retried on these statuses with exponential backoff,
+# the last response is returned once the retries are used up
+_RETRIES = 3
+_BACKOFF_FACTOR = 0.5
+_RETRY_STATUSES = (502, 503, 504)
+# default number of fetched DCs kept per client for conditional
+# (If-None-Match) requests
+_ETAG_CACHE_SIZE = 32
+
+
+_MODELS = {
+    "OrderedPair": OrderedPairModel,
+    "OrderedTriple": OrderedTripleModel,
+    "DataFrame": DataFrameModel,
+    "Grayscale": GrayscaleModel,
+    "Matrix": MatrixModel,
+    "Scalar": ScalarModel,
+    "Vector": VectorModel,
+    "Image": ImageModel,
+}
 
 
-class DefaultModel(BaseModel, Generic[DataC]):
+@dataclass(slots=True, frozen=True)
+class DefaultModel:
     ref: str
-    dataContainer: dict
+    # pydantic-core picks the container model from the "type" tag
+    dataContainer: Annotated[
+        Union[
+            OrderedPairModel,
+            OrderedTripleModel,
+            DataFrameModel,
+            MatrixModel,
+            GrayscaleModel,
+            ScalarModel,
+            VectorModel,
+            ImageModel,
+        ],
+        Field(discriminator="type"),
+    ]
     workspaceId: str
     location: str
     note: str
 
 
-class OrderedPairModel(DefaultModel[DataC], Generic[DataC]):
-    data: Optional[DataC]
+_RESPONSE_ADAPTER = TypeAdapter(DefaultModel)
 
-    @validator("dataContainer")
-    def type_must_match(cls, dc):
-        assert dc["type"] == "OrderedPair", "dataContainer type does not match."
-        return dc
 
-    @validator("dataContainer")
-    def keys_must_match(cls, dc):
-        assert "x" in dc, 'dataContainer does not contain "x" dataset.'
-        assert "y" in dc, 'dataContainer does not contain "y" dataset.'
-        assert isinstance(dc["x"], list), '"x" dataset is not a list'
-        assert isinstance(dc["y"], list), '"y" dataset is not a list'
-        return dc
+def check_deserialize(response):
+    dc_type = response["dataContainer"]["type"]
+    if dc_type not in _MODELS:
+        raise TypeError(
+            f"Unsupported DataContainer type: {dc_type}. Check case (e.g. OrderedPair)."
+        )
+    _RESPONSE_ADAPTER.validate_python(response)
 
 
-class OrderedTripleModel(DefaultModel[DataC], Generic[DataC]):
-    data: Optional[DataC]
+def _ordered_pair_payload(data) -> dict:
+    if not (isinstance(data, dict) and "x" in data and "y" in data):
+        raise TypeError(
+            "For ordered pair type, data must be in dictionary form with keys 'x' and 'y'"
+        )
+    return {"type": "OrderedPair", "x": data["x"], "y": data["y"]}
 
-    @validator("dataContainer")
-    def type_must_match(cls, dc):
-        assert dc["type"] == "OrderedTriple", "dataContainer type does not match."
-        return dc
 
-    @validator("dataContainer")
-    def keys_must_match(cls, dc):
-        assert "x" in dc, 'dataContainer does not contain "x" dataset.'
-        assert "y" in dc, 'dataContainer does not contain "y" dataset.'
-        assert "z" in dc, 'dataContainer does not contain "z" dataset.'
-        assert isinstance(dc["x"], list), '"x" dataset is not a list'
-        assert isinstance(dc["y"], list), '"y" dataset is not a list'
-        assert isinstance(dc["z"], list), '"z" dataset is not a list'
-        return dc
+def _ordered_triple_payload(data) -> dict:
+    if not (isinstance(data, dict) and "x" in data and "y" in data and "z" in data):
+        raise TypeError(
+            "For ordered triple type, data must be in dictionary form with keys 'x', 'y', and 'z'"
+        )
+    return {"type": "OrderedTriple", "x": data["x"], "y": data["y"], "z": data["z"]}
 
 
-class DataFrameModel(DefaultModel[DataC], Generic[DataC]):
-    data: Optional[DataC]
+def _dataframe_payload(data) -> dict:
+    if isinstance(data, pd.DataFrame):
+        data = _json_default(data)
+    return {"type": "DataFrame", "m": data}
 
-    @validator("dataContainer")
-    def type_must_match(cls, dc):
-        assert dc["type"] == "DataFrame", "dataContainer type does not match."
-        return dc
-
-    @validator("dataContainer")
-    def keys_must_match(cls, dc):
-        assert "m" in dc, 'dataContainer does not contain "m" dataset.'
-        assert isinstance(
-            dc["m"], dict
-        ), f'"m" dataset is not a list, type: {type(dc["m"])}'
-        return dc
 
+def _to_dataframe(m: dict) -> pd.DataFrame:
+    if m.keys() == {"index", "columns", "data"}:
+        return pd.DataFrame(**m)
+    # DCs stored before the "split" orient was used
+    return pd.DataFrame(m)
 
-class MatrixModel(DefaultModel[DataC], Generic[DataC]):
-    data: Optional[DataC]
 
-    @validator("dataContainer")
-    def type_must_match(cls, dc):
-        assert dc["type"] == "Matrix", "dataContainer type does not match."
-        return dc
-
-    @validator("dataContainer")
-    def keys_must_match(cls, dc):
-        assert "m" in dc, 'dataContainer does not contain "m" dataset.'
-        assert isinstance(dc["m"], list), '"m" dataset is not a list'
-        assert isinstance(dc["m"][0], list), '"m" dataset is not a matrix'
-        assert not isinstance(dc["m"][0][0], list), '"m" dataset is not 2D'
-        return dc
+def _matrix_payload(data) -> dict:
+    return {"type": "Matrix", "m": data}
 
 
-class GrayscaleModel(DefaultModel[DataC], Generic[DataC]):
-    data: Optional[DataC]
+def _grayscale_payload(data) -> dict:
+    return {"type": "Grayscale", "m": data}
 
-    @validator("dataContainer")
-    def type_must_match(cls, dc):
-        assert dc["type"] == "Grayscale", "dataContainer type does not match."
-        return dc
 
-    @validator("dataContainer")
-    def keys_must_match(cls, dc):
-        assert "m" in dc, 'dataContainer does not contain "m" dataset.'
-        assert isinstance(dc["m"], list), '"m" dataset is not a list'
-        assert isinstance(dc["m"][0], list), '"m" dataset is not a matrix'
-        assert not isinstance(dc["m"][0][0], list), '"m" dataset is not 2D'
-        return dc
+def _scalar_payload(data) -> dict:
+    return {"type": "Scalar", "c": data}
 
 
-class ScalarModel(DefaultModel[DataC], Generic[DataC]):
-    data: Optional[DataC]
+def _vector_payload(data) -> dict:
+    return {"type": "Vector", "v": data}
 
-    @validator("dataContainer")
-    def type_must_match(cls, dc):
-        assert dc["type"] == "Scalar", "dataContainer type does not match."
-        return dc
 
-    @validator("dataContainer")
-    def keys_must_match(cls, dc):
-        assert "c" in dc, 'dataContainer does not contain "c" dataset.'
-        assert isinstance(dc["c"], float) or isinstance(
-            dc["c"], int
-        ), '"c" dataset is not a float or int'
-        return dc
+def _image_payload(data) -> dict:
+    RGB_img = np.asarray(data)
+    # one HWC -> CHW copy makes every channel a C-contiguous slice that
+    # orjson serializes straight from its buffer, strided views would go
+    # through tolist()
+    channels = np.ascontiguousarray(np.moveaxis(RGB_img, -1, 0))
+    red_channel = channels[0]
+    green_channel = channels[1]
+    blue_channel = channels[2]
 
+    if RGB_img.shape[2] == 4:
+        alpha_channel = channels[3]
+    else:
+        alpha_channel = None
+    return {
+        "type": "Image",
+        "r": red_channel,
+        "g": green_channel,
+        "b": blue_channel,
+        "a": alpha_channel,
+    }
 
-class VectorModel(DefaultModel[DataC], Generic[DataC]):
-    data: Optional[DataC]
 
-    @validator("dataContainer")
-    def type_must_match(cls, dc):
-        assert dc["type"] == "Vector", "dataContainer type does not match."
-        return dc
+def _png_image_payload(data) -> dict:
+    if not isinstance(data, PILImage.Image):
+        data = PILImage.fromarray(np.asarray(data))
+    buf = io.BytesIO()
+    data.save(buf, "PNG")
+    return {
+        "type": "Image",
+        "format": "png_b64",
+        "data": base64.b64encode(buf.getvalue()).decode(),
+    }
 
-    @validator("dataContainer")
-    def keys_must_match(cls, dc):
-        assert "v" in dc, 'dataContainer does not contain "v" dataset.'
-        assert isinstance(dc["v"], list)
-        return dc
 
+def _decode_png_image(image: dict) -> PILImage.Image:
+    return PILImage.open(io.BytesIO(base64.b64decode(image["data"])))
 
-class ImageModel(DefaultModel[DataC], Generic[DataC]):
-    data: Optional[DataC]
 
-    @validator("dataContainer")
-    def type_must_match(cls, dc):
-        assert dc["type"] == "Image", "dataContainer type does not match."
-        return dc
+def _scalar(c) -> float:
+    # NaN is sent as null, see _dumps
+    return float("nan") if c is None else float(c)
 
-    @validator("dataContainer")
-    def keys_must_match(cls, dc):
-        assert "r" in dc, 'dataContainer does not contain "r" dataset.'
-        assert "g" in dc, 'dataContainer does not contain "g" dataset.'
-        assert "b" in dc, 'dataContainer does not contain "b" dataset.'
-        assert isinstance(dc["r"], list), '"r" dataset is not a list'
-        assert isinstance(dc["g"], list), '"g" dataset is not a list'
-        assert isinstance(dc["b"], list), '"b" dataset is not a list'
-        return dc
 
+def _column(values: list):
+    """Convert a dataset to a numpy column so pandas can skip its
+    per-element dtype inference. Lists numpy can only store as objects
+    (e.g. numbers with nulls) are left for pandas to infer."""
+    arr = np.asarray(values)
+    return values if arr.dtype == object else arr
 
-def check_deserialize(response):
-    dc_type = response["dataContainer"]["type"]
-    match dc_type:
-        case "OrderedPair":
-            OrderedPairModel.parse_obj(response)
-        case "OrderedTriple":
-            OrderedTripleModel.parse_obj(response)
-        case "DataFrame":
-            DataFrameModel.parse_obj(response)
-        case "Matrix":
-            MatrixModel.parse_obj(response)
-        case "Grayscale":
-            GrayscaleModel.parse_obj(response)
-        case "Scalar":
-            ScalarModel.parse_obj(response)
-        case "Vector":
-            VectorModel.parse_obj(response)
-        case "Image":
-            ImageModel.parse_obj(response)
-        case _:
-            raise TypeError(
-                f"Unsupported DataContainer type: {dc_type}. Check case (e.g. OrderedPair)."
-            )
 
+_PAYLOAD_BUILDERS = {
+    "OrderedPair": _ordered_pair_payload,
+    "OrderedTriple": _ordered_triple_payload,
+    "DataFrame": _dataframe_payload,
+    "Grayscale": _grayscale_payload,
+    "Matrix": _matrix_payload,
+    "Scalar": _scalar_payload,
+    "Vector": _vector_payload,
+    "Image": _image_payload,
+}
 
-class FlojoyCloud:
-    """
-    A class that allows pulling and pushing DataContainers from the
-    Flojoy cloud client (cloud.flojoy.ai).
 
-    Returns data in a pythonic format (e.g. Pillow for images,
-    DataFrames for arrays/matrices).
+@functools.lru_cache(maxsize=1)
+def _default_api_key() -> str:
+    credentials = get_credentials()
+    if not credentials:
+        raise ValueError(
+            "No Flojoy cloud API key found, pass api_key to FlojoyCloud explicitly."
+        )
+    return credentials[0]["value"]
 
-    Will support the majority of the Flojoy cloud API:
-    https://rest.flojoy.ai/api-reference
 
-    Recommended for api key:
-    utils.get_credentials()[0]["value"]
-    or
-    os.environ.get("FLOJOY_CLOUD_KEY")
+class _FlojoyCloudBase:
+    """
+    Payload formatting and conversion shared by the sync and async
+    Flojoy cloud clients, see FlojoyCloud.
     """
 
-    def __init__(self, api_key: str):
+    VALID_TYPES = frozenset(_MODELS)
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        png_images: bool = False,
+        validate: bool = False,
+        etag_cache_size: int = _ETAG_CACHE_SIZE,
+    ):
+        if api_key is None:
+            api_key = _default_api_key()
         self.headers = {"api_key": api_key}
+        self.png_images = png_images
+        self.validate = validate
+        self.etag_cache_size = etag_cache_size
         self.base_url = "https://cloud.flojoy.ai/api/v1"
-        self.valid_types = [
-            "OrderedPair",
-            "OrderedTriple",
-            "DataFrame",
-            "Grayscale",
-            "Matrix",
-            "Scalar",
-            "Vector",
-            "Image",
-        ]
+        # dc_id -> (ETag, response), least recently used first
+        self._etag_cache: OrderedDict[str, tuple[str, dict]] = OrderedDict()
 
-    def _create_payload(self, data, dc_type: str) -> str:
+    @classmethod
+    def refresh_credentials(cls):
         """
-        A method that formats data into a payload that can be handled by
-        the Flojoy cloud client.
+        Forget the cached default api key so the next instance re-reads
+        the stored credentials.
         """
-        if isinstance(data, DataContainer):
-            return json.dumps({"data": data}, cls=PlotlyJSONEncoder)
+        _default_api_key.cache_clear()
 
-        assert (
-            dc_type in self.valid_types
-        ), f"Type {dc_type} not supported. Check capitals (e.g. OrderedPair)."
-        match dc_type:
-            case "OrderedPair":
-                if not (isinstance(data, dict) and "x" in data and "y" in data):
-                    raise TypeError(
-                        "For ordered pair type, data must be in dictionary form with keys 'x' and 'y'"
-                    )
-                payload = json.dumps(
-                    {
-                        "data": {
-                            "type": "OrderedPair",
-                            "x": data["x"],
-                            "y": data["y"],
-                        }
-                    },
-                    cls=NumpyEncoder,
-                )
-        match dc_type:
-            case "OrderedTriple":
-                if isinstance(data, dict) and "x" in data:
-                    payload = json.dumps(
-                        {
-                            "data": {
-                                "type": "OrderedTriple",
-                                "x": data["x"],
-                                "y": data["y"],
-                                "z": data["z"],
-                            }
-                        },
-                        cls=NumpyEncoder,
-                    )
-                else:
-                    print(
-                        "For ordered triple type, data must be in"
-                        " dictionary form with keys 'x', 'y', and 'z'"
-                    )
-                    raise TypeError
-            case "DataFrame":
-                payload = json.dumps(
-                    {"data": {"type": "DataFrame", "m": data}}, cls=PlotlyJSONEncoder
-                )
-            case "Matrix":
-                payload = json.dumps(
-                    {"data": {"type": "Matrix", "m": data}}, cls=NumpyEncoder
-                )
-            case "Grayscale":
-                payload = json.dumps(
-                    {"data": {"type": "Grayscale", "m": data}}, cls=NumpyEncoder
-                )
-            case "Scalar":
-                payload = json.dumps(
-                    {"data": {"type": "Scalar", "c": data}}, cls=NumpyEncoder
-                )
-            case "Vector":
-                payload = json.dumps(
-                    {"data": {"type": "Vector", "v": data}}, cls=NumpyEncoder
-                )
-            case "Image":
-                RGB_img = np.asarray(data)
-                red_channel = RGB_img[:, :, 0]
-                green_channel = RGB_img[:, :, 1]
-                blue_channel = RGB_img[:, :, 2]
+    def _etag_headers(self, cached: Optional[tuple[str, dict]]) -> dict:
+        if cached is None:
+            return {}
+        return {"If-None-Match": cached[0]}
 
-                if RGB_img.shape[2] == 4:
-                    alpha_channel = RGB_img[:, :, 3]
-                else:
-                    alpha_channel = None
-                payload = json.dumps(
-                    {
-                        "data": {
-                            "type": "Image",
-                            "r": red_channel,
-                            "g": green_channel,
-                            "b": blue_channel,
-                            "a": alpha_channel,
-                        }
-                    },
-                    cls=NumpyEncoder,
-                )
-
-        return payload
+    def _from_etag_cache(self, dc_id: str, cached: Optional[tuple[str, dict]]) -> dict:
+        if cached is None:
+            raise ValueError(
+                f"Got 304 Not Modified for DC {dc_id} without sending its ETag"
+            )
+        # concurrent fetches may have evicted it while the request was in flight
+        self._to_etag_cache(dc_id, *cached)
+        return cached[1]
+
+    def _to_etag_cache(self, dc_id: str, etag: Optional[str], response: dict):
+        if etag is None or self.etag_cache_size <= 0:
+            return
+        self._etag_cache[dc_id] = (etag, response)
+        self._etag_cache.move_to_end(dc_id)
+        if len(self._etag_cache) > self.etag_cache_size:
+            self._etag_cache.popitem(last=False)
 
-    def fetch_dc(self, dc_id: str) -> dict:
+    def _create_payload(self, data, dc_type: str) -> str:
         """
-        A method that retrieves DataContainers from the Flojoy cloud.
+        A method that formats data into a payload that can be handled by
+        the Flojoy cloud client.
         """
-        url = f"{self.base_url}/dcs/{dc_id}"
-        response = requests.request("GET", url, headers=self.headers)
-        response = json.loads(response.text)
-        check_deserialize(response)
-        return response
+        if isinstance(data, DataContainer):
+            return _dumps({"data": data})
+
+        if dc_type not in self.VALID_TYPES:
+            raise AssertionError(
+                f"Type {dc_type} not supported. Check capitals (e.g. OrderedPair)."
+            )
+        if dc_type == "Image" and self.png_images:
+            return _dumps({"data": _png_image_payload(data)})
+        return _dumps({"data": _PAYLOAD_BUILDERS[dc_type](data)})
 
-    def to_python(self, dc: dict) -> pd.DataFrame | float | list | PILImage.Image:
+    def to_python(
+        self, dc: dict
+    ) -> pd.DataFrame | np.ndarray | float | list | PILImage.Image:
         """
         A method that converts data from DataContainers into pythonic
-        data types like Pillow for images.
+        data types like Pillow for images and numpy arrays for matrices.
         """
         dc_type = dc["dataContainer"]["type"]
         match dc_type:
             case "OrderedPair" | "OrderedTriple":
-                df = pd.DataFrame(dc["dataContainer"])
-                return df.drop(columns=["type"])
-            case "DataFrame" | "Matrix" | "Grayscale":
-                df = pd.DataFrame(dc["dataContainer"]["m"])
-                return df
+                container = dc["dataContainer"]
+                axes = "xyz" if dc_type == "OrderedTriple" else "xy"
+                return pd.DataFrame({k: _column(container[k]) for k in axes})
+            case "DataFrame":
+                return _to_dataframe(dc["dataContainer"]["m"])
+            case "Matrix" | "Grayscale":
+                return np.asarray(dc["dataContainer"]["m"])
             case "Scalar":
-                return float(dc["dataContainer"]["c"])
+                return _scalar(dc["dataContainer"]["c"])
             case "Vector":
                 return list(dc["dataContainer"]["v"])
             case "Image":
                 image = dc["dataContainer"]
-                r = image["r"]
-                g = image["g"]
-                b = image["b"]
-                if "a" in image:
-                    a = image["a"]
-                    img_combined = np.stack((r, g, b, a), axis=2)
-                    return PILImage.fromarray(np.uint8(img_combined)).convert("RGBA")
-                else:
-                    img_combined = np.stack((r, g, b), axis=2)
-                    return PILImage.fromarray(np.uint8(img_combined)).convert("RGB")
+                if image.get("format") == "png_b64":
+                    return _decode_png_image(image)
+                channels = [image["r"], image["g"], image["b"]]
+                if image.get("a") is not None:
+                    channels.append(image["a"])
+                # fill a uint8 buffer directly, fromarray then infers RGB/RGBA
+                # from the channel count without an int64 copy or convert()
+                r = np.asarray(channels[0], dtype=np.uint8)
+                img = np.empty(r.shape + (len(channels),), dtype=np.uint8)
+                img[..., 0] = r
+                for i, channel in enumerate(channels[1:], start=1):
+                    img[..., i] = np.asarray(channel, dtype=np.uint8)
+                return PILImage.fromarray(img)
 
     def to_dc(self, dc: dict) -> DataContainer:
         """
@@ -384,20 +479,26 @@ class FlojoyCloud:
                     x=np.array(dc["x"]), y=np.array(dc["y"]), z=np.array(dc["z"])
                 )
             case "DataFrame":
-                return DataFrame(df=pd.DataFrame(dc["m"]))
+                return DataFrame(df=_to_dataframe(dc["m"]))
             case "Matrix":
                 return Matrix(m=np.array(dc["m"]))
             case "Grayscale":
                 return Grayscale(img=np.array(dc["m"]))
             case "Scalar":
-                return Scalar(c=float(dc["c"]))
+                return Scalar(c=_scalar(dc["c"]))
             case "Vector":
                 return Vector(v=np.array(dc["v"]))
             case "Image":
+                if dc.get("format") == "png_b64":
+                    img = np.asarray(_decode_png_image(dc))
+                    r, g, b = img[:, :, 0], img[:, :, 1], img[:, :, 2]
+                    if img.shape[2] == 4:
+                        return Image(r=r, g=g, b=b, a=img[:, :, 3])
+                    return Image(r=r, g=g, b=b)
                 r = np.array(dc["r"], dtype=np.uint8)
                 g = np.array(dc["g"], dtype=np.uint8)
                 b = np.array(dc["b"], dtype=np.uint8)
-                if "a" in dc:
+                if dc.get("a") is not None:
                     a = np.array(dc["a"], dtype=np.uint8)
                     return Image(r=r, g=g, b=b, a=a)
                 else:
@@ -405,14 +506,101 @@ class FlojoyCloud:
             case _:
                 raise Exception("Unknown data container type")
 
+
+class FlojoyCloud(_FlojoyCloudBase):
+    """
+    A class that allows pulling and pushing DataContainers from the
+    Flojoy cloud client (cloud.flojoy.ai).
+
+    Returns data in a pythonic format (e.g. Pillow for images,
+    numpy arrays for matrices, DataFrames for ordered pairs/triples).
+
+    Will support the majority of the Flojoy cloud API:
+    https://rest.flojoy.ai/api-reference
+
+    Recommended for api key:
+    utils.get_credentials()[0]["value"]
+    or
+    os.environ.get("FLOJOY_CLOUD_KEY")
+
+    When no api key is passed, the first stored credential is used. It is
+    read once per process, call FlojoyCloud.refresh_credentials() after
+    changing it.
+
+    Set png_images=True to upload images as a single base64 encoded PNG
+    instead of one integer list per channel. The server must support the
+    "png_b64" image format.
+
+    Set validate=True to check fetched DCs against the expected schema,
+    e.g. while developing against the API. Responses are trusted otherwise.
+
+    Read requests are retried up to three times on 502/503/504 responses,
+    after that the last response is parsed and returned as usual.
+
+    fetch_dc keeps the last etag_cache_size DCs to revalidate them with
+    their ETag instead of downloading them again. Large DCs such as images
+    are kept in full, lower it to bound memory or set it to 0 to disable
+    the cache.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        png_images: bool = False,
+        validate: bool = False,
+        etag_cache_size: int = _ETAG_CACHE_SIZE,
+    ):
+        super().__init__(api_key, png_images, validate, etag_cache_size)
+        # a single session keeps the TLS connection alive between calls
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self._mount_adapter(_POOL_SIZE)
+
+    def _mount_adapter(self, pool_size: int):
+        self._pool_size = pool_size
+        self.session.get_adapter("https://").close()
+        self.session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=_POOL_SIZE,
+                pool_maxsize=pool_size,
+                max_retries=Retry(
+                    total=_RETRIES,
+                    backoff_factor=_BACKOFF_FACTOR,
+                    status_forcelist=_RETRY_STATUSES,
+                    raise_on_status=False,
+                ),
+            ),
+        )
+
+    def fetch_dc(self, dc_id: str) -> dict:
+        """
+        A method that retrieves DataContainers from the Flojoy cloud.
+
+        Recently fetched DCs are revalidated with their ETag. When the DC
+        has not changed, the dict returned by the previous call is returned
+        again: it is shared with the cache, so copy it before mutating.
+        """
+        url = f"{self.base_url}/dcs/{dc_id}"
+        cached = self._etag_cache.get(dc_id)
+        response = self.session.request("GET", url, headers=self._etag_headers(cached))
+        if response.status_code == 304:
+            return self._from_etag_cache(dc_id, cached)
+        dc = orjson.loads(response.content)
+        if self.validate:
+            check_deserialize(dc)
+        if response.status_code == 200:
+            self._to_etag_cache(dc_id, response.headers.get("ETag"), dc)
+        return dc
+
     def create_measurement(self, name: str, privacy: str = "private") -> dict:
         """
         A method that creates a measurements with the name specified.
         """
         url = f"{self.base_url}/measurements"
         payload = json.dumps({"name": name, "privacy": privacy})
-        response = requests.request("POST", url, headers=self.headers, data=payload)
-        response = json.loads(response.text)
+        response = self.session.request("POST", url, data=payload)
+        response = orjson.loads(response.content)
 
         return response
 
@@ -424,8 +612,8 @@ class FlojoyCloud:
         an error will be thrown.
         """
         url = f"{self.base_url}/measurements/?size={size}"
-        response = requests.request("GET", url, headers=self.headers)
-        response = json.loads(response.text)
+        response = self.session.request("GET", url)
+        response = orjson.loads(response.content)
         response = response["data"]
 
         return response
@@ -435,8 +623,8 @@ class FlojoyCloud:
         A method fetchs measurements from the client.
         """
         url = f"{self.base_url}/measurements/{meas_id}"
-        response = requests.request("GET", url, headers=self.headers)
-        response = json.loads(response.text)
+        response = self.session.request("GET", url)
+        response = orjson.loads(response.content)
 
         return response
 
@@ -446,8 +634,8 @@ class FlojoyCloud:
         """
         url = f"{self.base_url}/measurements/{meas_id}"
         payload = payload = json.dumps({"name": name})
-        response = requests.request("PATCH", url, headers=self.headers, data=payload)
-        response = json.loads(response.text)
+        response = self.session.request("PATCH", url, data=payload)
+        response = orjson.loads(response.content)
 
         return response
 
@@ -457,6 +645,181 @@ class FlojoyCloud:
         """
         url = f"{self.base_url}/dcs/add/{meas_id}"
         payload = self._create_payload(data, dc_type)
-        response = requests.request("POST", url, headers=self.headers, data=payload)
+        response = self.session.request("POST", url, data=payload)
+
+        return orjson.loads(response.content)
+
+    def store_dcs(
+        self,
+        items: Iterable[tuple[Any, str]],
+        meas_id: str,
+        max_workers: int = _POOL_SIZE,
+    ) -> list:
+        """
+        A method that stores several (data, dc_type) pairs in a measurement.
+
+        Uploads run concurrently over the shared session, responses are
+        returned in the same order as items. The session's connection pool
+        grows to max_workers so no worker's connection gets discarded.
+        """
+        if max_workers > self._pool_size:
+            self._mount_adapter(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda item: self.store_dc(item[0], item[1], meas_id), items
+                )
+            )
+
+
+class FlojoyCloudAsync(_FlojoyCloudBase):
+    """
+    An asyncio version of FlojoyCloud, for issuing many cloud calls
+    concurrently, e.g. with asyncio.gather.
+
+    Requests share one httpx.AsyncClient over HTTP/2, so concurrent calls
+    are multiplexed on a single connection. Requires the optional httpx
+    dependency (pip install "flojoy[async]"). Failed requests are retried
+    like in FlojoyCloud.
+
+    Usage
+    -----
+    async with FlojoyCloudAsync() as cloud:
+        dcs = await asyncio.gather(*(cloud.fetch_dc(i) for i in dc_ids))
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        png_images: bool = False,
+        validate: bool = False,
+        etag_cache_size: int = _ETAG_CACHE_SIZE,
+    ):
+        super().__init__(api_key, png_images, validate, etag_cache_size)
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                'FlojoyCloudAsync requires httpx, install it with pip install "flojoy[async]"'
+            )
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=_POOL_SIZE),
+                retries=_RETRIES,
+            ),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Close the underlying connections.
+        """
+        await self.client.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs):
+        # same policy as the Retry mounted on FlojoyCloud's session
+        for attempt in range(_RETRIES + 1):
+            response = await self.client.request(method, url, **kwargs)
+            if (
+                response.status_code not in _RETRY_STATUSES
+                or method not in Retry.DEFAULT_ALLOWED_METHODS
+                or attempt == _RETRIES
+            ):
+                return response
+            await asyncio.sleep(_BACKOFF_FACTOR * 2**attempt)
+
+    async def fetch_dc(self, dc_id: str) -> dict:
+        """
+        A method that retrieves DataContainers from the Flojoy cloud.
+
+        Recently fetched DCs are revalidated with their ETag. When the DC
+        has not changed, the dict returned by the previous call is returned
+        again: it is shared with the cache, so copy it before mutating.
+        """
+        url = f"{self.base_url}/dcs/{dc_id}"
+        cached = self._etag_cache.get(dc_id)
+        response = await self._request("GET", url, headers=self._etag_headers(cached))
+        if response.status_code == 304:
+            return self._from_etag_cache(dc_id, cached)
+        dc = orjson.loads(response.content)
+        if self.validate:
+            check_deserialize(dc)
+        if response.status_code == 200:
+            self._to_etag_cache(dc_id, response.headers.get("ETag"), dc)
+        return dc
+
+    async def create_measurement(self, name: str, privacy: str = "private") -> dict:
+        """
+        A method that creates a measurements with the name specified.
+        """
+        url = f"{self.base_url}/measurements"
+        payload = json.dumps({"name": name, "privacy": privacy})
+        response = await self._request("POST", url, content=payload)
+
+        return orjson.loads(response.content)
+
+    async def list_measurements(self, size: int = 10) -> list:
+        """
+        A method that lists the number of measurements specified.
+        """
+        url = f"{self.base_url}/measurements/?size={size}"
+        response = await self._request("GET", url)
+
+        return orjson.loads(response.content)["data"]
+
+    async def fetch_measurement(self, meas_id: str):
+        """
+        A method fetchs measurements from the client.
+        """
+        url = f"{self.base_url}/measurements/{meas_id}"
+        response = await self._request("GET", url)
+
+        return orjson.loads(response.content)
+
+    async def rename_measurement(self, meas_id: str, name: str):
+        """
+        Rename the specified measurement.
+        """
+        url = f"{self.base_url}/measurements/{meas_id}"
+        payload = json.dumps({"name": name})
+        response = await self._request("PATCH", url, content=payload)
+
+        return orjson.loads(response.content)
+
+    async def store_dc(self, data, dc_type: str, meas_id: str):
+        """
+        A method that stores a formatted data payload in a measurement.
+        """
+        url = f"{self.base_url}/dcs/add/{meas_id}"
+        payload = self._create_payload(data, dc_type)
+        response = await self._request("POST", url, content=payload)
+
+        return orjson.loads(response.content)
+
+    async def store_dcs(
+        self,
+        items: Iterable[tuple[Any, str]],
+        meas_id: str,
+        max_workers: int = _POOL_SIZE,
+    ) -> list:
+        """
+        A method that stores several (data, dc_type) pairs in a measurement.
+
+        At most max_workers uploads run at once, so a large batch never
+        waits on the client's connection pool for longer than its timeout.
+        Responses are returned in the same order as items.
+        """
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def store(data, dc_type: str):
+            async with semaphore:
+                return await self.store_dc(data, dc_type, meas_id)
 
-        return json.loads(response.text)
+        return await asyncio.gather(*(store(data, dc_type) for data, dc_type in items))
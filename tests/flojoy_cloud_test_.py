@@ -0,0 +1,456 @@
+import asyncio
+import http.server
+import json
+import socketserver
+import threading
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+from urllib3.util.retry import Retry
+
+from flojoy.data_container import DataFrame
+from flojoy.flojoy_cloud import FlojoyCloud, FlojoyCloudAsync, check_deserialize
+
+
+def test_create_payload_ordered_pair_numpy():
+    """Test that numpy arrays are serialized as plain JSON lists"""
+    cloud = FlojoyCloud(api_key="test")
+    payload = cloud._create_payload(
+        {"x": np.arange(3), "y": np.array([0.5, 1.5, np.nan])}, "OrderedPair"
+    )
+
+    assert json.loads(payload) == {
+        "data": {"type": "OrderedPair", "x": [0, 1, 2], "y": [0.5, 1.5, None]}
+    }
+
+
+def test_create_payload_image_channels():
+    """Test that each image channel is sent as a 2D list"""
+    cloud = FlojoyCloud(api_key="test")
+    img = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+    payload = json.loads(cloud._create_payload(img, "Image"))["data"]
+
+    for i, channel in enumerate("rgba"):
+        assert payload[channel] == img[:, :, i].tolist()
+
+
+def test_create_payload_dataframe_is_not_double_encoded():
+    """Test that DataFrames are sent as JSON objects rather than JSON strings"""
+    cloud = FlojoyCloud(api_key="test")
+    df = pd.DataFrame({"col1": [1, 2], "col2": [3.0, 4.0]})
+    payload = json.loads(cloud._create_payload(df, "DataFrame"))["data"]
+
+    assert payload["m"] == {
+        "index": [0, 1],
+        "columns": ["col1", "col2"],
+        "data": [[1, 3.0], [2, 4.0]],
+    }
+    pd.testing.assert_frame_equal(cloud.to_python({"dataContainer": payload}), df)
+
+
+def test_check_deserialize_dispatches_on_type():
+    """Test that responses are validated against the model matching their type"""
+    response = {
+        "ref": "ref",
+        "workspaceId": "workspace",
+        "location": "location",
+        "note": "",
+        "dataContainer": {"type": "Matrix", "m": [[1, 2], [3, 4]]},
+    }
+    check_deserialize(response)
+
+    response["dataContainer"] = {"type": "Matrix", "m": [[[1, 2]]]}
+    with pytest.raises(ValidationError):
+        check_deserialize(response)
+
+    response["dataContainer"] = {"type": "OrderedPair", "x": [1, 2], "y": [0.5, None]}
+    check_deserialize(response)
+
+    for invalid in (
+        {"type": "Matrix", "m": [[1], [1, 2]]},
+        {"type": "Matrix", "m": [1, 2]},
+        {"type": "Vector", "v": [[1, 2]]},
+        {"type": "OrderedPair", "x": ["1", "2"], "y": [1, 2]},
+        {"type": "OrderedPair", "x": [True, False], "y": [1, 2]},
+        {"type": "OrderedPair", "x": [1, "a", None], "y": [1, 2, 3]},
+    ):
+        response["dataContainer"] = invalid
+        with pytest.raises(ValidationError):
+            check_deserialize(response)
+
+    response["dataContainer"] = {"type": "matrix", "m": [[1, 2], [3, 4]]}
+    with pytest.raises(TypeError):
+        check_deserialize(response)
+
+
+@pytest.mark.parametrize("channels", [3, 4])
+def test_to_python_image_round_trip(channels):
+    """Test that an uploaded image payload converts back to the same Pillow image"""
+    cloud = FlojoyCloud(api_key="test")
+    img = np.arange(2 * 3 * channels, dtype=np.uint8).reshape(2, 3, channels)
+    payload = json.loads(cloud._create_payload(img, "Image"))["data"]
+
+    out = cloud.to_python({"dataContainer": payload})
+
+    assert out.mode == ("RGBA" if channels == 4 else "RGB")
+    np.testing.assert_array_equal(np.asarray(out), img)
+
+
+def test_png_image_payload_round_trip():
+    """Test that images uploaded as PNG convert back to the same pixels"""
+    cloud = FlojoyCloud(api_key="test", png_images=True)
+    img = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+    payload = json.loads(cloud._create_payload(img, "Image"))["data"]
+
+    assert payload["format"] == "png_b64"
+    np.testing.assert_array_equal(
+        np.asarray(cloud.to_python({"dataContainer": payload})), img
+    )
+
+
+@patch("flojoy.flojoy_cloud.get_credentials")
+def test_default_api_key_is_cached(mock_get_credentials):
+    """Test that the stored credentials are only read once until refreshed"""
+    mock_get_credentials.return_value = [{"key": "cloud", "value": "secret"}]
+    FlojoyCloud.refresh_credentials()
+
+    assert FlojoyCloud().headers == {"api_key": "secret"}
+    assert FlojoyCloud().headers == {"api_key": "secret"}
+    assert mock_get_credentials.call_count == 1
+
+    FlojoyCloud.refresh_credentials()
+    FlojoyCloud()
+    assert mock_get_credentials.call_count == 2
+
+
+def test_store_dcs_keeps_order():
+    """Test that concurrent uploads return responses in the order of the items"""
+    cloud = FlojoyCloud(api_key="test")
+    items = [(i, "Scalar") for i in range(20)]
+    with patch.object(
+        cloud, "store_dc", side_effect=lambda data, dc_type, meas_id: data
+    ) as mock_store_dc:
+        assert cloud.store_dcs(items, "meas", max_workers=4) == list(range(20))
+
+    mock_store_dc.assert_any_call(3, "Scalar", "meas")
+
+
+@pytest.mark.parametrize("max_workers, pool_maxsize", [(4, 10), (20, 20)])
+def test_store_dcs_grows_connection_pool(max_workers, pool_maxsize):
+    """Test that the session keeps a pooled connection for every upload worker"""
+    cloud = FlojoyCloud(api_key="test")
+    with patch.object(cloud, "store_dc"):
+        cloud.store_dcs([(1, "Scalar")], "meas", max_workers=max_workers)
+
+    adapter = cloud.session.get_adapter("https://cloud.flojoy.ai")
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == pool_maxsize
+    assert adapter.max_retries.raise_on_status is False
+
+
+def test_async_fetch_dcs_concurrently():
+    """Test that FlojoyCloudAsync fetches and validates several DCs with gather"""
+    httpx = pytest.importorskip("httpx")
+
+    def handler(request):
+        dc_id = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(
+            200,
+            json={
+                "ref": dc_id,
+                "workspaceId": "workspace",
+                "location": "location",
+                "note": "",
+                "dataContainer": {"type": "Scalar", "c": int(dc_id)},
+            },
+        )
+
+    async def fetch_all():
+        async with FlojoyCloudAsync(api_key="test", validate=True) as cloud:
+            await cloud.client.aclose()
+            cloud.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            dcs = await asyncio.gather(*(cloud.fetch_dc(str(i)) for i in range(5)))
+            return [cloud.to_python(dc) for dc in dcs]
+
+    assert asyncio.run(fetch_all()) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_fetch_dc_reuses_cached_response_on_304():
+    """Test that fetch_dc revalidates with If-None-Match and reuses the cached DC"""
+    cloud = FlojoyCloud(api_key="test")
+    dc = {
+        "ref": "ref",
+        "workspaceId": "workspace",
+        "location": "location",
+        "note": "",
+        "dataContainer": {"type": "Scalar", "c": 1},
+    }
+    ok = MagicMock(status_code=200, content=json.dumps(dc).encode())
+    ok.headers = {"ETag": '"v1"'}
+    not_modified = MagicMock(status_code=304, content=b"")
+    not_modified.headers = {}
+
+    with patch.object(
+        cloud.session, "request", side_effect=[ok, not_modified]
+    ) as mock_request:
+        first = cloud.fetch_dc("dc")
+        second = cloud.fetch_dc("dc")
+
+    assert first == dc
+    assert second is first
+    assert mock_request.call_args_list[0].kwargs["headers"] == {}
+    assert mock_request.call_args_list[1].kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_async_fetch_dc_304_after_eviction():
+    """Test that a 304 still returns the DC when concurrent fetches evicted it"""
+    httpx = pytest.importorskip("httpx")
+
+    async def handler(request):
+        await asyncio.sleep(0)
+        dc_id = request.url.path.rsplit("/", 1)[-1]
+        if request.headers.get("If-None-Match") == f'"{dc_id}"':
+            return httpx.Response(304)
+        return httpx.Response(
+            200,
+            headers={"ETag": f'"{dc_id}"'},
+            json={
+                "ref": dc_id,
+                "workspaceId": "workspace",
+                "location": "location",
+                "note": "",
+                "dataContainer": {"type": "Scalar", "c": int(dc_id)},
+            },
+        )
+
+    async def fetch_twice():
+        async with FlojoyCloudAsync(api_key="test", etag_cache_size=4) as cloud:
+            await cloud.client.aclose()
+            cloud.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            for _ in range(2):
+                dcs = await asyncio.gather(*(cloud.fetch_dc(str(i)) for i in range(10)))
+            return [cloud.to_python(dc) for dc in dcs]
+
+    assert asyncio.run(fetch_twice()) == [float(i) for i in range(10)]
+
+
+def test_fetch_dc_304_without_cached_dc():
+    """Test that an unexpected 304 raises instead of parsing an empty body"""
+    cloud = FlojoyCloud(api_key="test")
+    not_modified = MagicMock(status_code=304, content=b"")
+    not_modified.headers = {}
+
+    with patch.object(cloud.session, "request", return_value=not_modified):
+        with pytest.raises(ValueError, match="304"):
+            cloud.fetch_dc("dc")
+
+
+def test_to_dc_rgb_image_with_null_alpha():
+    """Test that to_dc treats the null alpha channel sent for RGB images as absent"""
+    cloud = FlojoyCloud(api_key="test")
+    img = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    payload = json.loads(cloud._create_payload(img, "Image"))["data"]
+
+    dc = cloud.to_dc({"dataContainer": payload})
+
+    assert dc.get("a") is None
+    np.testing.assert_array_equal(dc.b, img[:, :, 2])
+
+
+def test_scalar_nan_round_trip():
+    """Test that a NaN scalar, sent as null, converts back to NaN"""
+    cloud = FlojoyCloud(api_key="test")
+    payload = json.loads(cloud._create_payload(np.nan, "Scalar"))["data"]
+    assert payload["c"] is None
+
+    check_deserialize(
+        {
+            "ref": "ref",
+            "workspaceId": "workspace",
+            "location": "location",
+            "note": "",
+            "dataContainer": payload,
+        }
+    )
+    assert np.isnan(cloud.to_python({"dataContainer": payload}))
+    assert np.isnan(cloud.to_dc({"dataContainer": payload}).c)
+
+
+def test_dataframe_datacontainer_round_trip():
+    """Test that DataFrame DataContainers are sent as objects and read back"""
+    cloud = FlojoyCloud(api_key="test")
+    df = pd.DataFrame({"col1": [1, 2], "col2": [3.0, 4.0]})
+    payload = json.loads(cloud._create_payload(DataFrame(df=df), None))["data"]
+
+    assert isinstance(payload["m"], dict)
+    check_deserialize(
+        {
+            "ref": "ref",
+            "workspaceId": "workspace",
+            "location": "location",
+            "note": "",
+            "dataContainer": payload,
+        }
+    )
+    pd.testing.assert_frame_equal(cloud.to_python({"dataContainer": payload}), df)
+    pd.testing.assert_frame_equal(cloud.to_dc({"dataContainer": payload}).m, df)
+
+
+@pytest.mark.parametrize("dc_type", ["Matrix", "Grayscale"])
+def test_to_python_matrix_returns_ndarray(dc_type):
+    """Test that Matrix and Grayscale DCs convert to numpy arrays"""
+    cloud = FlojoyCloud(api_key="test")
+    m = np.array([[1.0, 2.0], [3.0, 4.0]])
+    payload = json.loads(cloud._create_payload(m, dc_type))["data"]
+
+    out = cloud.to_python({"dataContainer": payload})
+
+    assert isinstance(out, np.ndarray)
+    np.testing.assert_array_equal(out, m)
+
+
+def test_to_python_ordered_triple_columns():
+    """Test that ordered triples become typed columns, with nulls read as NaN"""
+    cloud = FlojoyCloud(api_key="test")
+    dc = {
+        "dataContainer": {
+            "type": "OrderedTriple",
+            "x": [1, 2, 3],
+            "y": [0.5, 1.5, 2.5],
+            "z": [1.0, None, 3.0],
+        }
+    }
+
+    df = cloud.to_python(dc)
+
+    assert list(df.columns) == ["x", "y", "z"]
+    assert df["x"].dtype == np.int64
+    assert df["y"].dtype == np.float64
+    assert df["z"].dtype == np.float64
+    assert np.isnan(df["z"][1])
+
+
+@pytest.mark.parametrize(
+    "etag_cache_size, status_code", [(0, 200), (32, 202), (32, 404)]
+)
+def test_fetch_dc_etag_cache_skipped(etag_cache_size, status_code):
+    """Test that nothing is cached when the cache is disabled or the fetch is not a 200"""
+    cloud = FlojoyCloud(api_key="test", etag_cache_size=etag_cache_size)
+    response = MagicMock(status_code=status_code, content=b'{"error": "x"}')
+    response.headers = {"ETag": '"v1"'}
+
+    with patch.object(
+        cloud.session, "request", side_effect=[response, response]
+    ) as mock_request:
+        cloud.fetch_dc("dc")
+        cloud.fetch_dc("dc")
+
+    assert mock_request.call_args_list[1].kwargs["headers"] == {}
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_fetch_dc_validates_only_when_enabled(validate):
+    """Test that fetch_dc only runs check_deserialize with validate=True"""
+    cloud = FlojoyCloud(api_key="test", validate=validate)
+    invalid = {
+        "ref": "ref",
+        "workspaceId": "workspace",
+        "location": "location",
+        "note": "",
+        "dataContainer": {"type": "Matrix", "m": [1, 2]},
+    }
+    response = MagicMock(status_code=200, content=json.dumps(invalid).encode())
+    response.headers = {}
+
+    with patch.object(cloud.session, "request", return_value=response):
+        if validate:
+            with pytest.raises(ValidationError):
+                cloud.fetch_dc("dc")
+        else:
+            assert cloud.fetch_dc("dc") == invalid
+
+
+def test_async_store_dcs_bounds_concurrency():
+    """Test that FlojoyCloudAsync.store_dcs keeps at most max_workers uploads running"""
+    pytest.importorskip("httpx")
+    running = 0
+    peak = 0
+
+    async def store_dc(data, dc_type, meas_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0)
+        running -= 1
+        return data
+
+    async def store_all():
+        async with FlojoyCloudAsync(api_key="test") as cloud:
+            with patch.object(cloud, "store_dc", side_effect=store_dc):
+                items = [(i, "Scalar") for i in range(20)]
+                return await cloud.store_dcs(items, "meas", max_workers=3)
+
+    assert asyncio.run(store_all()) == list(range(20))
+    assert peak == 3
+
+
+@pytest.fixture
+def unavailable_server():
+    requests_seen = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            requests_seen.append(self.path)
+            body = b'{"error": "unavailable"}'
+            self.send_response(503)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = socketserver.TCPServer(("localhost", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{server.server_address[1]}", requests_seen
+    server.shutdown()
+    thread.join()
+
+
+def test_fetch_measurement_returns_error_body_after_retries(unavailable_server):
+    """Test that a persistent 503 is retried, then its body is returned"""
+    url, requests_seen = unavailable_server
+    cloud = FlojoyCloud(api_key="test")
+    cloud.base_url = url
+    cloud.session.mount("http://", cloud.session.get_adapter("https://"))
+
+    with patch.object(Retry, "sleep"):
+        assert cloud.fetch_measurement("meas") == {"error": "unavailable"}
+
+    assert len(requests_seen) == 4
+
+
+def test_async_retries_only_idempotent_requests():
+    """Test that FlojoyCloudAsync retries GETs like FlojoyCloud but not POSTs"""
+    httpx = pytest.importorskip("httpx")
+    methods = []
+
+    def handler(request):
+        methods.append(request.method)
+        return httpx.Response(503, json={"error": "unavailable"})
+
+    async def fetch_and_store():
+        async with FlojoyCloudAsync(api_key="test") as cloud:
+            await cloud.client.aclose()
+            cloud.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with patch("asyncio.sleep"):
+                return (
+                    await cloud.fetch_measurement("meas"),
+                    await cloud.store_dc(1, "Scalar", "meas"),
+                )
+
+    assert asyncio.run(fetch_and_store()) == ({"error": "unavailable"},) * 2
+    assert methods == ["GET"] * 4 + ["POST"]